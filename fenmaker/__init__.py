@@ -0,0 +1 @@
+from .fenmaker import extract_movetext, game_starting_fen, read_games, replay_pgn
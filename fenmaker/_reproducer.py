@@ -1,9 +1,7 @@
-import chess
-import chess.pgn
-import io
-import re
+import sys
+
+from fenmaker import extract_movetext, read_games
 
-starting_fen = "rn1qk2r/ppp1bppp/4pn2/6Bb/2BP4/2N2N1P/PPP2PP1/R2QK2R w KQkq - 0 1"
 pgn = """
 [Event "?"]
 [Site "?"]
@@ -52,28 +50,29 @@ pgn = """
 29. Ke3 {-0.25 40/0 34 110949}
 """
 
-move_info = []
-
-def pgn_to_uci_command(starting_fen: str, pgn: str) -> str:
-    _, per_move_pgn = pgn.strip().split("\n\n")
-    for move in per_move_pgn:
-        _, real_move_str = move.split(". ")
-        movedata = re.findall(r'[^{} ]+|\{[^}]+\}', real_move_str.strip())
-
-        if len(movedata) == 4:
-            move1_nodes = movedata[1].split(" ")[3]
-            move2_nodes = movedata[3].split(" ")[3]
+def find_move_info(pgn: str) -> list[tuple[str, int]]:
+    move_info = []
+    movetext = extract_movetext(pgn)
+    pos = 0
+    while (lb := movetext.find("{", pos)) != -1:
+        tokens = [tok for tok in movetext[pos:lb].split() if not tok.startswith("$")]
+        pos = movetext.index("}", lb) + 1
+        if not tokens:
+            continue  # Game comment, or a second comment on the same move
+        if tokens[-1].endswith("."):
+            raise ValueError(f"Comment {movetext[lb:pos]} does not follow a move")
+        braced = movetext[lb + 1:pos - 1].partition(",")[0]
+        move_info.append((tokens[-1], int(braced.rsplit(None, 1)[-1])))
 
-            move_info.append({ "move": movedata[0], "nodes": int(move1_nodes[:-1]) })
-            move_info.append({ "move": movedata[2], "nodes": int(move2_nodes[:-1]) })
-        elif len(movedata) == 2:
-            move1_nodes = movedata[1].split(" ")[3]
-            move_info.append({ "move": movedata[0], "nodes": int(move1_nodes[:-1]) })
-        else:
-            print("disaster")
+    return move_info
 
-    "e"
+def main(path: str) -> None:
+    for game_text in read_games(path):
+        print(find_move_info(game_text))
 
-uci_command = pgn_to_uci_command(starting_fen, pgn)
-print(move_info)
-print(uci_command)
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main(sys.argv[1])
+    else:
+        move_info = find_move_info(pgn)
+        print(move_info)
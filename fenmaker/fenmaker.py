@@ -1,47 +1,118 @@
 import chess
-import chess.pgn
-import io
-import re
-
-def clean_pgn(pgn: str) -> str:
-    """Remove comments and annotations from PGN."""
-    cleaned_pgn = re.sub(r"\{[^}]*\}", "", pgn)
-    return cleaned_pgn.strip()
-
-def pgn_to_uci_command(starting_fen: str, pgn: str) -> str:
-    # Load the starting FEN into a board
-    board = chess.Board(starting_fen)
-    
-    # Clean the PGN to remove comments
-    cleaned_pgn = clean_pgn(pgn)
-    
-    # Use StringIO to create a file-like object from the cleaned PGN string
-    pgn_io = io.StringIO(cleaned_pgn)
-    
-    # Read the PGN
-    print("Reading PGN...")
-    game = chess.pgn.read_game(pgn_io)
+import functools
+import logging
+import sys
+from typing import Iterator
+
+_RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+logger = logging.getLogger(__name__)
+
+def _san_tokens(movetext: str) -> Iterator[str]:
+    """Yield the whitespace-separated tokens of movetext, skipping {...} comments."""
+    pos = 0
+    while (lb := movetext.find("{", pos)) != -1:
+        yield from movetext[pos:lb].split()
+        pos = movetext.index("}", lb) + 1
+    yield from movetext[pos:].split()
+
+def extract_movetext(pgn: str) -> str:
+    """Return the movetext of a PGN, skipping the tag section if there is one."""
+    pgn = pgn.replace("\r\n", "\n").strip()
+    if pgn.startswith("["):
+        _, _, pgn = pgn.partition("\n\n")
+    return pgn
+
+@functools.lru_cache(maxsize=32)
+def _board_from_fen(fen: str) -> chess.Board:
+    return chess.Board(fen)
+
+def replay_pgn(starting_fen: str | chess.Board, pgn: str) -> tuple[str, list[str]]:
+    """Replay the moves of a PGN and return the starting FEN and the moves in UCI notation."""
+    # Load the starting position into a board, reusing the parsed FEN
+    if isinstance(starting_fen, chess.Board):
+        board = starting_fen.copy(stack=False)
+        starting_fen = board.fen()
+    else:
+        board = _board_from_fen(starting_fen).copy(stack=False)
     
-    if game is None:
-        raise ValueError("Failed to parse PGN")
+    # Everything after the tag pairs is the movetext
+    movetext = extract_movetext(pgn)
     
-    # Extract the moves from the PGN
+    # Replay the SAN moves straight onto the board, skipping comments
+    logger.debug("Reading PGN...")
     moves = []
-    node = game
-    while node.variations:
-        next_node = node.variation(0)
-        move = next_node.move
-        if move not in board.legal_moves:
-            raise ValueError(f"Illegal move {move} for the current board position")
+    for tok in _san_tokens(movetext):
+        if tok.endswith(".") or tok.startswith("$") or tok in _RESULTS:
+            continue  # Skip move numbers, NAGs and the game result
+        move = board.push_san(tok)  # Parse and play the move in one step
         moves.append(move.uci())  # Use UCI notation directly for the moves
-        board.push(move)  # Update the board
-        node = next_node
+    
+    return starting_fen, moves
+
+def pgn_to_uci_command(starting_fen: str | chess.Board, pgn: str) -> str:
+    starting_fen, moves = replay_pgn(starting_fen, pgn)
     
     # Create the UCI command
     uci_command = f"position fen {starting_fen} moves {' '.join(moves)}"
     
     return uci_command
 
+def _read_one_pgn(f) -> str | None:
+    """Read the next game from an open PGN file, or None at end of file."""
+    tags, movetext = [], []
+    blank_after_tags = False
+    in_comment = False
+    while True:
+        pos = f.tell()
+        if not (line := f.readline()):
+            break
+
+        if in_comment:
+            movetext.append(line)
+        elif line.isspace():
+            if movetext:
+                break  # Blank line after the movetext ends the game
+            blank_after_tags = bool(tags)
+            continue
+        elif line.startswith("[") and not movetext:
+            if blank_after_tags:
+                f.seek(pos)  # A game without movetext; this tag starts the next one
+                break
+            tags.append(line)
+            continue
+        else:
+            movetext.append(line)
+
+        # Blank lines inside a {...} comment do not end the game
+        lb, rb = line.rfind("{"), line.rfind("}")
+        if lb != rb:
+            in_comment = lb > rb
+
+    if not tags and not movetext:
+        return None
+    if not tags:
+        return "".join(movetext)
+
+    return "".join(tags) + "\n" + "".join(movetext)
+
+def game_starting_fen(pgn: str) -> str:
+    """Return the FEN tag of a game, falling back to the standard start position."""
+    for line in pgn.splitlines():
+        if line.startswith('[FEN "'):
+            return line[6:line.rindex('"')]
+    return chess.STARTING_FEN
+
+def read_games(path: str) -> Iterator[str]:
+    """Yield the games of a PGN file one at a time."""
+    with open(path) as f:
+        while (game_text := _read_one_pgn(f)) is not None:
+            yield game_text
+
+def main(path: str) -> None:
+    for game_text in read_games(path):
+        print(pgn_to_uci_command(game_starting_fen(game_text), game_text))
+
 # Example usage
 starting_fen = "rn1qk2r/ppp1bppp/4pn2/6Bb/2BP4/2N2N1P/PPP2PP1/R2QK2R w KQkq - 0 1"
 pgn = """
@@ -92,5 +163,9 @@ pgn = """
 29. Ke3 {-0.25 40/0 34 110949, Black's connection stalls} 1-0
 """
 
-uci_command = pgn_to_uci_command(starting_fen, pgn)
-print(uci_command)
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main(sys.argv[1])
+    else:
+        uci_command = pgn_to_uci_command(starting_fen, pgn)
+        print(uci_command)
@@ -1,7 +1,10 @@
 import chess
-import chess.pgn
-import io
-import re
+import logging
+import sys
+
+from fenmaker import extract_movetext, game_starting_fen, read_games, replay_pgn
+
+logger = logging.getLogger(__name__)
 
 starting_fen = "r1bqk2r/p2nppb1/2pp1np1/1p5p/3PP3/P1N3PP/1PP1NPB1/R1BQK2R w KQkq - 0 1"
 pgn = """
@@ -55,74 +58,53 @@ pgn = """
 Ke5 {+0.17 101/0 124 300128}
 """
 
-nodes = []
-move_info = []
-
-def find_nodes(pgn: str):
-    _, per_move_pgn = pgn.strip().split("\n\n")
-    for move in per_move_pgn.strip().split("\n"):
-        print(move)
-        _, real_move_str = move.split(". ")
-        movedata = re.findall(r'[^{} ]+|\{[^}]+\}', real_move_str.strip())
-
-        if len(movedata) == 4:
-            move1_nodes = movedata[1].split(" ")[3]
-            move2_nodes = movedata[3].split(" ")[3]
-
-            nodes.append(int(move1_nodes[:-1]))
-            nodes.append(int(move2_nodes[:-1]))
-        elif len(movedata) == 2:
-            move1_nodes = movedata[1].split(" ")[3]
-            nodes.append(int(move1_nodes[:-1]))
-        else:
-            print("disaster")
+def find_nodes(pgn: str) -> list[int]:
+    nodes = []
+    movetext = extract_movetext(pgn)
+    pos = 0
+    while (lb := movetext.find("{", pos)) != -1:
+        follows_move = any(not tok.startswith("$") for tok in movetext[pos:lb].split())
+        pos = movetext.index("}", lb) + 1
+        if not follows_move:
+            continue  # Game comment, or a second comment on the same move
 
+        logger.debug("%s", movetext[lb:pos])
+        braced = movetext[lb + 1:pos - 1].partition(",")[0]
+        nodes.append(int(braced.rsplit(None, 1)[-1]))
 
-def pgn_to_uci_command(starting_fen: str, pgn: str) -> str:
-    find_nodes(pgn)
+    return nodes
 
-    board = chess.Board(starting_fen)
-    cleaned_pgn = pgn
-    pgn_io = io.StringIO(cleaned_pgn)
-    
-    print("Reading PGN...")
-    game = chess.pgn.read_game(pgn_io)
-    
-    if game is None:
-        raise ValueError("Failed to parse PGN")
-    
-    moves = []
-    node = game
-    i = 0
+def pgn_to_uci_command(starting_fen: str | chess.Board, pgn: str) -> tuple[str, list[tuple[str, int]]]:
+    node_counts = find_nodes(pgn)
 
-    while node.variations:
-        next_node = node.variation(0)
-
-        move = next_node.move
-        if move not in board.legal_moves:
-            raise ValueError(f"Illegal move {move} for the current board position")
-        moves.append(move.uci())
-        move_info.append({ "move": move.uci(), "nodes": nodes[i] })
-        
-        board.push(move)
-        node = next_node
-        i += 1
+    starting_fen, moves = replay_pgn(starting_fen, pgn)
+    move_info = list(zip(moves, node_counts, strict=True))
     
     uci_command = f"position fen {starting_fen} moves {' '.join(moves)}"
     
-    return uci_command
+    return uci_command, move_info
+
+def moves_to_nodes(starting_fen: str, move_info: list[tuple[str, int]]) -> str:
+    prefixes = []
+    joined = ""
 
-def moves_to_nodes() -> str:
-    uci_command = ""
+    for mv, _ in move_info:
+        joined += " " + mv
+        prefixes.append(joined)
 
-    for (i, entry) in enumerate(move_info):
-        uci_command += f"position fen {starting_fen} moves"
-        for prev_idx in range(0, i + 1):
-            uci_command += f" {move_info[prev_idx]["move"]}"
-        uci_command += f"\ngo nodes {entry["nodes"]}\n"
+    header = f"position fen {starting_fen} moves"
+    return "".join(f"{header}{p}\ngo nodes {n}\n" for p, (_, n) in zip(prefixes, move_info))
 
-    return uci_command
+def main(path: str) -> None:
+    for game_text in read_games(path):
+        fen = game_starting_fen(game_text)
+        _, move_info = pgn_to_uci_command(fen, game_text)
+        print(moves_to_nodes(fen, move_info))
 
-uci_command = pgn_to_uci_command(starting_fen, pgn)
-# print(uci_command)
-print(moves_to_nodes())
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main(sys.argv[1])
+    else:
+        uci_command, move_info = pgn_to_uci_command(starting_fen, pgn)
+        # print(uci_command)
+        print(moves_to_nodes(starting_fen, move_info))